@@ -1,6 +1,46 @@
-import json
+import sys
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+import numpy as np
 import pandas as pd
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+_EMPTY_PARAMS = {}
+
+
+def _parse(response):
+    """
+    Desc
+        Decoding a JSON response body straight from bytes, 
+        skipping the charset detection done by response.text.
+        Uses orjson when it is installed.
+    """
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
 
 
 class deltaDNA:
@@ -14,10 +54,58 @@ class deltaDNA:
                              'calculatingMetricMin',
                              'calculatingMetricMax',
                              'calculatingMetricSum']
+        self._event_detail_keys = tuple(self.paramField + self.metricsField)
+        self._event_detail_cols = ('eventName',) + self._event_detail_keys
+        self._param_list_keys = ('id', 'name', 'type', 'description', *self.metricsField)
+        # itemgetter pulls all fields in one call; merging over the defaults 
+        # keeps the None-for-missing-key behaviour of dict.get.
+        self._event_param_getter = itemgetter(*self._event_detail_keys)
+        self._event_param_defaults = dict.fromkeys(self._event_detail_keys)
+        self._param_list_getter = itemgetter(*self._param_list_keys)
+        self._param_list_defaults = dict.fromkeys(self._param_list_keys)
+        # Explicit Arrow dtypes for the returned tables; other columns are strings.
+        self._arrow_dtypes = {'Environment ID': 'int64[pyarrow]', 
+                              'ApplicationID': 'int64[pyarrow]', 
+                              'parameterID': 'int64[pyarrow]', 
+                              'ParameterID': 'int64[pyarrow]', 
+                              'required': 'bool[pyarrow]', 
+                              **dict.fromkeys(self.metricsField, 'bool[pyarrow]')}
+        self._search_cols_src = ['application', 'id', 'name', 'description', 'type'] + self.metricsField
+        self._search_cols_dst = ['Game ID', 'Parameter ID', 'Parameter Name', 'Description', 'Type'] + self.metricsField
+        self._cache = {}
+        self._cache_ttl = 60
+        self._aclient = None
+        
+        self._session = requests.Session()
+        # raise_on_status=False hands back the last response once retries run out, 
+        # so the status_code checks below still report the failure.
+        retry = Retry(total=3, backoff_factor=0.2, 
+                      status_forcelist=[429, 500, 502, 503, 504], 
+                      raise_on_status=False)
+        self._session.mount('https://', HTTPAdapter(pool_connections=4, 
+                                                    pool_maxsize=16, 
+                                                    max_retries=retry))
         
         self._token = self._get_token()
         self._header = {'Authorization': f'Bearer {self._token}'}
+        self._session.headers.update(self._header)
         self._game_list = self.game_list()
+        if self._game_list is None:
+            # Connection failed: every method reports the environment as not found.
+            self._env_ids = frozenset()
+            self._env_index = pd.DataFrame(columns=['Game Name', 'Environment Name'])
+            self._env_to_app = {}
+            self._env_to_game_name = {}
+        else:
+            # Environments other than Dev/Live have no inferable application ID, 
+            # so they are treated as not found.
+            known = self._game_list.dropna(subset=['Application ID'])
+            self._env_ids = frozenset(known['Environment ID'].tolist())
+            self._env_index = known.set_index('Environment ID')
+            self._env_to_app = dict(zip(known['Environment ID'].tolist(), 
+                                        known['Application ID'].tolist()))
+            self._env_to_game_name = dict(zip(known['Environment ID'].tolist(), 
+                                              known['Game Name'].tolist()))
     
     
     def _get_token(self):
@@ -26,10 +114,10 @@ class deltaDNA:
             Trying to get token using api key and password.
         """
         url = 'https://api.deltadna.net/api/authentication/v1/authenticate'
-        ddna = requests.post(url, json={'key': self._apiKey,
-                                        'password': self._password})
+        ddna = self._session.post(url, json={'key': self._apiKey,
+                                             'password': self._password})
         if ddna.status_code == 200:
-            token = json.loads(ddna.text)['idToken']
+            token = _parse(ddna)['idToken']
             print('Successfully connected Deltadna.')
             return token
         else:
@@ -44,43 +132,144 @@ class deltaDNA:
             and the Live environment ID is always the application ID +2.
         """
         url = 'https://api.deltadna.net/api/engage/v1/environments/'
-        ddna = requests.get(url, headers=self._header)
+        ddna = self._session.get(url)
         
         if ddna.status_code != 200:
             print('Failed to connect, error code: ', ddna.status_code)
             return None
         
-        games = pd.DataFrame(json.loads(ddna.text))
+        games = pd.DataFrame(_parse(ddna))
         games.columns = ['Game Name', 'Environment ID', 'Environment Name']
-        env_infer = games['Environment Name'].replace({'Dev': 1, 'Live': 2}).values
-        app_infer = games['Environment ID'].values - env_infer
-        games['Application ID'] = app_infer
+        env_infer = games['Environment Name'].map({'Dev': 1, 'Live': 2})
+        # Int64 keeps the column integer; unknown environment names become <NA>.
+        games['Application ID'] = (games['Environment ID'] - env_infer).astype('Int64')
         
         return games
     
     
+    def close(self):
+        """
+        Desc
+            Closing the underlying http session and its pooled connections.
+        """
+        self._session.close()
+    
+    
+    def _async_client(self):
+        """
+        Desc
+            Lazily creating the httpx client used by the async methods, 
+            so the sync API does not depend on httpx.
+        """
+        if httpx is None:
+            raise ImportError('httpx is required for the async methods.')
+        if self._aclient is None:
+            self._aclient = httpx.AsyncClient(http2=True, 
+                                              headers=self._header, 
+                                              limits=httpx.Limits(max_connections=8, 
+                                                                  max_keepalive_connections=8))
+        return self._aclient
+    
+    
+    async def aclose(self):
+        """
+        Desc
+            Closing the async client, if it was created.
+        """
+        if self._aclient is not None:
+            await self._aclient.aclose()
+            self._aclient = None
+    
+    
+    def _cached_get(self, 
+                    key:tuple, 
+                    ttl:float, 
+                    fetch_fn):
+        """
+        Desc
+            Return the cached value for key if it is younger than ttl seconds,
+            otherwise call fetch_fn and cache its result.
+            Failed fetches (None) are not cached.
+        """
+        hit = self._cache.get(key)
+        if hit is not None and time.monotonic() - hit[0] < ttl:
+            return hit[1]
+        
+        value = fetch_fn()
+        if value is not None:
+            self._cache[key] = (time.monotonic(), value)
+        
+        return value
+    
+    
+    def invalidate(self, 
+                   kind:str = None):
+        """
+        Desc
+            Dropping cached responses.
+        
+        Input
+            kind: 'events', 'event-parameters' or None for everything.
+        """
+        if kind is None:
+            self._cache.clear()
+        else:
+            for key in [k for k in self._cache if k[0] == kind]:
+                del self._cache[key]
+    
+    
     def _event_spec(self, 
                     env_id:int):
         """
         Desc 
             return all all events information for the environmentID.
         """
-        url = 'https://api.deltadna.net/api/events/v1/events'
-        ddna = requests.get(url, headers=self._header)
-        
-        if ddna.status_code != 200:
-            print('Failed to connect, error code: ', ddna.status_code)
-            return None
-        elif env_id not in self._game_list['Environment ID'].tolist():
+        if env_id not in self._env_ids:
             print('Environment ID not found in current API key.')
             return None
-        else:
-            print('Game connected :', 
-                  self._game_list[self._game_list['Environment ID']==env_id]['Game Name'][0], 
-                  self._game_list[self._game_list['Environment ID']==env_id]['Environment Name'][0])
         
-        events = json.loads(ddna.text)
-        spec = [events[i] for i in range(len(events)) if events[i]['environment']==env_id]
+        return self._cached_get(('events', env_id), self._cache_ttl, 
+                                lambda: self._fetch_event_spec(env_id))
+    
+    
+    def _fetch_event_spec(self, 
+                          env_id:int):
+        """
+        Desc
+            Requesting events information for the environmentID, uncached.
+        """
+        url = 'https://api.deltadna.net/api/events/v1/events'
+        if ijson is None:
+            ddna = self._session.get(url)
+            if ddna.status_code != 200:
+                print('Failed to connect, error code: ', ddna.status_code)
+                return None
+            
+            return self._select_events(_parse(ddna), env_id)
+        
+        # Stream the body and keep only the environment's events while parsing, 
+        # instead of materializing every event of the api key.
+        with self._session.get(url, stream=True) as ddna:
+            if ddna.status_code != 200:
+                print('Failed to connect, error code: ', ddna.status_code)
+                return None
+            
+            ddna.raw.decode_content = True
+            return self._select_events(ijson.items(ddna.raw, 'item', use_float=True), env_id)
+    
+    
+    def _select_events(self, 
+                       events:list, 
+                       env_id:int):
+        """
+        Desc
+            Keeping the events of the environmentID from a parsed /events response.
+            events can be a list or a lazy iterator over the response items.
+            env_id must already be checked against self._env_ids.
+        """
+        row = self._env_index.loc[env_id]
+        print('Game connected :', row['Game Name'], row['Environment Name'])
+        spec = [e for e in events if e['environment'] == env_id]
         
         return spec
     
@@ -105,24 +294,92 @@ class deltaDNA:
         """
         Desc
             return all events and parameters with details
+        
+        Output
+            pd.DataFrame, pyarrow-backed when pyarrow is installed.
         """
         events = self._event_spec(env_id=env_id)
         if events is None:
             return None
         
-        result = []
+        getter = self._event_param_getter
+        defaults = self._event_param_defaults
+        total = sum(len(e['parameters']) for e in events)
+        arr = np.empty((total, len(self._event_detail_cols)), dtype=object)
+        row = 0
         for event in events:
             name = event['name']
-            params = event['parameters']
-            detail = [[i.get(j) for j in self.paramField + self.metricsField] for i in params]
-            details = [[name] + i for i in detail]
-            details = pd.DataFrame(details, columns = ['eventName']+self.paramField+self.metricsField)
-            result.append(details)
-        result = pd.concat(result, axis=0).reset_index(drop=True)
+            for p in event['parameters']:
+                arr[row, 0] = name
+                arr[row, 1:] = getter(defaults | p)
+                row += 1
+        # An object block skips per-column inference, so restore int/bool dtypes.
+        result = pd.DataFrame(arr, columns = self._event_detail_cols).infer_objects()
         result.insert(0, 'Environment ID', env_id)
         result.rename(columns = {'name': 'Event Name', 'id': 'parameterID'}, inplace=True)
         
-        return result
+        return self._to_arrow(result)
+    
+    
+    async def event_details_many(self, 
+                                 env_ids:list):
+        """
+        Desc
+            return event_details for several environments.
+        
+        Note
+            /events returns every environment of the api key, so a single 
+            async GET is shared by all env_ids that are not cached yet; 
+            the per-environment tables reuse the sync parsing code.
+        
+        Output
+            A dict of environmentID to pd.DataFrame (None for failures).
+        """
+        # Unknown env ids are left to event_details, which reports them.
+        missing = []
+        for env_id in env_ids:
+            hit = self._cache.get(('events', env_id))
+            fresh = hit is not None and time.monotonic() - hit[0] < self._cache_ttl
+            if env_id in self._env_ids and not fresh:
+                missing.append(env_id)
+        if missing:
+            url = 'https://api.deltadna.net/api/events/v1/events'
+            ddna = await self._async_client().get(url)
+            if ddna.status_code != 200:
+                print('Failed to connect, error code: ', ddna.status_code)
+                return {env_id: None for env_id in env_ids}
+            
+            events = _parse(ddna)
+            for env_id in missing:
+                spec = self._select_events(events, env_id)
+                if spec is not None:
+                    self._cache[('events', env_id)] = (time.monotonic(), spec)
+        
+        return {env_id: self.event_details(env_id) for env_id in env_ids}
+    
+    
+    def _to_arrow(self, 
+                  df:pd.DataFrame):
+        """
+        Desc
+            Converting a table to pyarrow-backed dtypes: strings share one buffer 
+            and the metric flags become 1-bit bools. No-op without pyarrow.
+            Dtypes are explicit rather than inferred, so empty and all-None 
+            columns get the same types as populated ones.
+        """
+        if pyarrow is None:
+            return df
+        
+        return df.astype({c: self._arrow_dtypes.get(c, 'string[pyarrow]') for c in df.columns})
+    
+    
+    @staticmethod
+    def to_pandas_numpy(df:pd.DataFrame):
+        """
+        Desc
+            Converting a pyarrow-backed table back to numpy-backed dtypes for legacy code.
+        """
+        return df.convert_dtypes(dtype_backend='numpy_nullable')
     
     
     def _get_applicationID(self, 
@@ -131,28 +388,44 @@ class deltaDNA:
         Desc:
             Getting applicationID based on environmentID
         """
-        return self._game_list[self._game_list['Environment ID']==env_id]['Application ID'][0]
+        return self._env_to_app[env_id]
     
     
     def _parameter_spec(self, 
                         env_id:int, 
-                        params:dict):
+                        params:dict = None):
         """
         Desc
             return all parameters for the application
         """
+        if env_id not in self._env_ids:
+            print('Environment ID not found in current API key.')
+            return None
+        
+        params = params or _EMPTY_PARAMS
+        # List values (repeated query args) are turned into tuples to stay hashable.
+        key = ('event-parameters', env_id, 
+               tuple(sorted((k, tuple(v) if isinstance(v, list) else v) 
+                            for k, v in params.items())))
+        return self._cached_get(key, self._cache_ttl, 
+                                lambda: self._fetch_parameter_spec(env_id, params))
+    
+    
+    def _fetch_parameter_spec(self, 
+                              env_id:int, 
+                              params:dict):
+        """
+        Desc
+            Requesting parameters for the application, uncached.
+        """
         url = 'https://api.deltadna.net/api/events/v1/event-parameters'
-        ddna = requests.get(url, headers=self._header, params=params)
+        ddna = self._session.get(url, params=params or None)
         
         if ddna.status_code != 200:
             print('Failed to connect, error code: ', ddna.status_code)
             return None
         
-        if env_id not in self._game_list['Environment ID'].tolist():
-            print('Environment ID not found in current API key.')
-            return None
-        
-        parameters = json.loads(ddna.text)
+        parameters = _parse(ddna)
         
         applicationID = self._get_applicationID(env_id)
         parameters = [i for i in parameters if i['application'] == applicationID]
@@ -162,7 +435,7 @@ class deltaDNA:
     
     def parameter_list(self, 
                        env_id:int, 
-                       params:dict = {}):
+                       params:dict = None):
         """
         Desc:
             Return a list of parameters that in the game
@@ -172,29 +445,27 @@ class deltaDNA:
             thus query all parameters under the api key and extract right game parameters later.
             
         Output
-            pd.DataFrame
+            pd.DataFrame, pyarrow-backed when pyarrow is installed.
         """
         parameters = self._parameter_spec(env_id=env_id, params=params)
         
         if parameters is None:
             return None
         
-        result = []
-        for parameter in parameters:
-            param = [[parameter.get(j) for j in ['id', 'name', 'type', 'description'] + self.metricsField]]
-            param = pd.DataFrame(param, columns = ['id', 'name', 'type', 'description'] + self.metricsField)
-            result.append(param)
-        result = pd.concat(result, axis=0).reset_index(drop=True)
+        getter = self._param_list_getter
+        defaults = self._param_list_defaults
+        rows = [getter(defaults | p) for p in parameters]
+        result = pd.DataFrame(rows, columns = self._param_list_keys)
         result.rename(columns={'id': 'ParameterID'}, inplace=True)
         result.insert(0, 'ApplicationID', self._get_applicationID(env_id))
         
-        return result
+        return self._to_arrow(result)
     
     
     def parameter_search(self, 
                          env_id:int, 
                          param_name:int, 
-                         params:dict = {}):
+                         params:dict = None):
         """
         Desc
             Searching a parameter in the application.
@@ -212,17 +483,15 @@ class deltaDNA:
         Output
             Parameter detail, pd.DataFrame
         """
-        col_used = ['application', 'id', 'name', 'description', 'type'] + self.metricsField
         parameters = self._parameter_spec(env_id=env_id, params=params)
         
         if parameters is None:
             return None
         
-        parameter = [[i.get(j) for j in col_used] 
-                     for i in parameters if i['name']==param_name]
-        parameter = pd.DataFrame(parameter, columns = col_used)
-        parameter.columns = ['Game ID', 'Parameter ID', 'Parameter Name', 'Description', 'Type'] + self.metricsField
-        parameter.insert(0, 'Environemnt ID', env_id)
+        rows = [[p.get(k) for k in self._search_cols_src] 
+                for p in parameters if p['name']==param_name]
+        parameter = pd.DataFrame(rows, columns = self._search_cols_dst)
+        parameter.insert(0, 'Environment ID', env_id)
         
         return parameter
     
@@ -246,14 +515,15 @@ class deltaDNA:
             'environment': env_id
         }
         
-        ddna = requests.post(url, headers=self._header, json=body)
+        ddna = self._session.post(url, json=body)
         if ddna.status_code != 200:
             print('Failed creating the event, error code: ', ddna.status_code)
-            msg = json.loads(ddna.text)
+            msg = _parse(ddna)
             msg['parameters'] = 'None'
         else:
             print('Successfully created the event.', ddna.status_code)
-            msg = json.loads(ddna.text)
+            self.invalidate('events')
+            msg = _parse(ddna)
             msg['parameters'] = 'Not showing here.'
         
         return msg
@@ -283,9 +553,12 @@ class deltaDNA:
             JSON input data has to use double quote, and numbers have to be Python native int.
         """
         url = 'https://api.deltadna.net/api/events/v1/event-parameters'
-        param_id = self.event_details(env_id)['parameterID'].max() + 1
-        app_id = self._game_list[self._game_list['Environment ID']==env_id]['Application ID'].item()
-        app_name = self._game_list[self._game_list['Environment ID']==env_id]['Game Name'].item()
+        if env_id not in self._env_ids:
+            print('Environment ID not found in current API key.')
+            return None
+        
+        app_id = self._env_to_app[env_id]
+        app_name = self._env_to_game_name[env_id]
         body = {
             "id": 1020234,
             "name": param_name,
@@ -301,25 +574,22 @@ class deltaDNA:
             "calculatingMetricSum": calculatingMetricSum
         }
         
-        ddna = requests.post(url, headers=self._header, json=body)
+        ddna = self._session.post(url, json=body)
         if ddna.status_code != 200:
             print('Failed to create the parameter. Error code: ', ddna.status_code)
-            print(json.loads(ddna.text)['title'])
+            print(_parse(ddna)['title'])
             body.update({'isCreated': False})
             return body
         else:
-            print('Successfully created the parameter.')
-            response = json.loads(ddna.text)
-            print('[', response['name'], ']', 'created in', response['application'], 
-                  '[', app_name, ']', 'with type', 
-                  response['type'], 'and format', response['format'], '.')
-            print('calculatingMetricFirst:', response.get('calculatingMetricFirst'))
-            print('calculatingMetricLast:', response.get('calculatingMetricLast'))
-            print('calculatingMetricCount:', response.get('calculatingMetricCount'))
-            print('calculatingMetricMin:', response.get('calculatingMetricMin'))
-            print('calculatingMetricMax:', response.get('calculatingMetricMax'))
-            print('calculatingMetricSum:', response.get('calculatingMetricSum'))
-            print('\n')
+            self.invalidate('event-parameters')
+            response = _parse(ddna)
+            # One write for the whole report, bulk creation calls this a lot.
+            lines = ['Successfully created the parameter.', 
+                     f'[ {response["name"]} ] created in {response["application"]} '
+                     f'[ {app_name} ] with type {response["type"]} '
+                     f'and format {response["format"]} .']
+            lines += [f'{k}: {response.get(k)}' for k in self.metricsField]
+            sys.stdout.write('\n'.join(lines) + '\n\n\n')
             body.update({'isCreated': True})
             return body
     
@@ -341,8 +611,21 @@ class deltaDNA:
         prep = {'add': 'to', 'remove': 'from'}
         body = {'add': {"required": required}, 'remove': {}}
         
-        event_id = [i for i in self.event_list(env_id) if i[0]==event_name]
-        param_id = self.parameter_search(env_id, param_name)['Parameter ID']
+        if env_id not in self._env_ids:
+            print('Environment ID not found in current API key.')
+            return None
+        
+        # The two lookups are independent, so issue both GETs concurrently 
+        # over the shared session's connection pool.
+        with ThreadPoolExecutor(max_workers=2) as ex:
+            f_ev = ex.submit(self.event_list, env_id)
+            f_pr = ex.submit(self.parameter_search, env_id, param_name)
+            events, params_df = f_ev.result(), f_pr.result()
+        if events is None or params_df is None:
+            return None
+        
+        event_id = [i for i in events if i[0]==event_name]
+        param_id = params_df['Parameter ID']
         if len(event_id) != 1:
             print('Event is not found.')
             return None
@@ -354,14 +637,16 @@ class deltaDNA:
             param_id = param_id.item()
         
         url = f'https://api.deltadna.net/api/events/v1/events/{event_id}/{add_remove}/{param_id}'
-        ddna = requests.post(url, headers=self._header, json=body[add_remove])
+        ddna = self._session.post(url, json=body[add_remove])
         if ddna.status_code != 200:
             print(f'Failed to {add_remove} the parameter [ {param_name} ] {prep[add_remove]} '
                   f'the event [ {event_name} ]')
-            return json.loads(ddna.text)['title']
+            return _parse(ddna)['title']
+        
+        self.invalidate('events')
         
         if add_remove == 'add':
-            result = json.loads(ddna.text)['parameters']
+            result = _parse(ddna)['parameters']
             result = [i for i in result if i['name']==param_name][0]
             result.update({'From Event': event_name})
             return result